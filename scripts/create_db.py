@@ -1,4 +1,4 @@
-from immersion_whisper.database.setup import create_db
+from immersion_whisper.database.setup import init_db
 
 if __name__ == '__main__':
-    create_db()
+    init_db()
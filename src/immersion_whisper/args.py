@@ -12,5 +12,16 @@ def parse_args():
         type=Path,
         help='Path to the video or audio file for transcription.',
     )
+    parser.add_argument(
+        '--reset',
+        action='store_true',
+        help='Drop and re-create the subtitle database before processing.',
+    )
+    parser.add_argument(
+        '--vad',
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help='Override the configured voice activity detection setting.',
+    )
 
     return parser.parse_args()
@@ -1,10 +1,16 @@
 import logging
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, MutableMapping
 
 import yaml
 from pydantic import BaseModel
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,6 +40,7 @@ class VadConfig(BaseModel):
 
 class TranscriberConfig(BaseModel):
     language: str
+    batch_size: int
     model: ModelConfig
     vad: VadConfig
     hotwords: list[str]
@@ -51,6 +58,8 @@ class CondenserConfig(BaseModel):
 
 class SubProcessorConfig(BaseModel):
     spacy_model: str
+    batch_size: int
+    n_process: int
 
 
 class Config(BaseModel):
@@ -61,20 +70,20 @@ class Config(BaseModel):
     sub_processor: SubProcessorConfig
 
 
-def deep_merge(
+def chain_merge(
     base: MutableMapping[str, Any], update: MutableMapping[str, Any]
-) -> MutableMapping[str, Any]:
-    """Recursively merges the 'update' dictionary into the 'base' dictionary."""
-    for key, value in update.items():
-        if (
-            isinstance(value, MutableMapping)
-            and key in base
-            and isinstance(base[key], MutableMapping)
-        ):
-            base[key] = deep_merge(base[key], value)
-        else:
-            base[key] = value
-    return base
+) -> dict[str, Any]:
+    """Merges 'update' over 'base' into a fresh dictionary."""
+    return {
+        **base,
+        **{
+            key: chain_merge(base[key], value)
+            if isinstance(value, MutableMapping)
+            and isinstance(base.get(key), MutableMapping)
+            else value
+            for key, value in update.items()
+        },
+    }
 
 
 def load_config(
@@ -83,16 +92,27 @@ def load_config(
 ) -> Config:
     """Loads a default config and merges a local config over it."""
     with open(default_path, 'r') as file:
-        config = yaml.safe_load(file)
+        config = yaml.load(file, Loader=_YamlLoader)
 
     try:
         with open(local_path, 'r') as file:
-            local_config = yaml.safe_load(file)
-            config = deep_merge(config, local_config)
+            local_config = yaml.load(file, Loader=_YamlLoader)
+            config = chain_merge(config, local_config)
     except FileNotFoundError:
         logger.warning('No local config found. Using default settings')
 
     return Config(**config)
 
 
-SETTINGS = load_config()
+@lru_cache(maxsize=1)
+def get_settings() -> Config:
+    """Returns the application config, loading it on first use."""
+    return load_config()
+
+
+def __getattr__(name: str):
+    # Keep `from .config import SETTINGS` working for existing callers while
+    # deferring the YAML parse until the config is actually accessed.
+    if name == 'SETTINGS':
+        return get_settings()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
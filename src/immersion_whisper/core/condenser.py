@@ -1,59 +1,86 @@
 import logging
+import subprocess
 import sys
+import tempfile
 from pathlib import Path
 
-import pysrt
-from pydub import AudioSegment
+import numpy as np
 
-from ..config import SETTINGS
+from ..config import get_settings
+from .srt_utils import parse_srt
 
 logger = logging.getLogger(__name__)
 
-
-def srt_time_to_ms(time_obj: pysrt.SubRipTime):
-    """Converts a SubRipTime object to milliseconds."""
-    return (
-        time_obj.hours * 3600 + time_obj.minutes * 60 + time_obj.seconds
-    ) * 1000 + time_obj.milliseconds
+# Filter graphs longer than this get written to a script file instead, to
+# stay clear of the OS argument-length limit.
+_MAX_FILTER_ARG_LEN = 32768
+
+
+def _merge_intervals(
+    starts_ms: np.ndarray, ends_ms: np.ndarray, padding_ms: int
+) -> list[tuple[int, int]]:
+    """Computes padded, merged speech intervals (in ms) for all subtitles."""
+    starts = starts_ms - padding_ms
+    ends = ends_ms + padding_ms
+    np.clip(starts, 0, None, out=starts)
+
+    order = np.argsort(starts, kind='stable')
+    starts = starts[order]
+    ends = ends[order]
+
+    # An interval starts a new group wherever it begins after the running
+    # maximum end of everything before it.
+    running_max = np.maximum.accumulate(ends)
+    group_starts = np.flatnonzero(
+        np.concatenate(([True], starts[1:] >= running_max[:-1]))
+    )
+    merged_starts = starts[group_starts]
+    merged_ends = running_max[np.concatenate((group_starts[1:] - 1, [len(ends) - 1]))]
+
+    return list(zip(merged_starts.tolist(), merged_ends.tolist()))
+
+
+def _encode_condensed(audio_path: Path, intervals: list, output_path: Path):
+    """Encodes the selected intervals to MP3 in a single ffmpeg pass."""
+    expr = '+'.join(
+        f'between(t,{start / 1000},{end / 1000})' for start, end in intervals
+    )
+    filter_graph = f"aselect='{expr}',asetpts=N/SR/TB"
+
+    command = ['ffmpeg', '-y', '-i', str(audio_path), '-vn', '-q:a', '2']
+    filter_script_path = None
+
+    if len(filter_graph) > _MAX_FILTER_ARG_LEN:
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.txt', delete=False
+        ) as filter_script:
+            filter_script.write(filter_graph)
+            filter_script_path = Path(filter_script.name)
+        command.extend(['-filter_script:a', str(filter_script_path)])
+    else:
+        command.extend(['-af', filter_graph])
+    command.append(str(output_path))
+
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+    finally:
+        if filter_script_path is not None:
+            filter_script_path.unlink(missing_ok=True)
 
 
 def condense(audio_path: Path, srt_path: Path, output_path: Path):
     """Condenses the audio of a WAV file based on the provided SRT file."""
     logger.info('Creating condensed audio...')
-    audio = AudioSegment.from_file(str(audio_path))
-    subs = pysrt.open(str(srt_path))
+    subs = parse_srt(srt_path)
 
-    if not subs:
+    if not subs.texts:
         logger.warning("No subtitles found in '%s'. Exiting.", srt_path)
         sys.exit(1)
 
-    intervals = []
-    for sub in subs:
-        start = srt_time_to_ms(sub.start)
-        end = srt_time_to_ms(sub.end)
-
-        padding_ms = SETTINGS.condenser.padding_ms
-        padded_start = max(0, start - padding_ms)
-        padded_end = end + padding_ms
-        intervals.append([padded_start, padded_end])
-
-    intervals.sort(key=lambda x: x[0])
-
-    merged_intervals = [intervals[0]]
-    for current_start, current_end in intervals[1:]:
-        _, last_end = merged_intervals[-1]
-
-        if current_start < last_end:
-            merged_intervals[-1][1] = max(last_end, current_end)
-        else:
-            merged_intervals.append([current_start, current_end])
-
-    condensed_audio = AudioSegment.empty()
-
-    for start, end in merged_intervals:
-        segment = audio[start:end]
-        condensed_audio += segment
+    merged_intervals = _merge_intervals(
+        subs.starts_ms, subs.ends_ms, get_settings().condenser.padding_ms
+    )
 
     output_path.parent.mkdir(exist_ok=True)
-    condensed_audio.export(output_path, format='mp3', parameters=['-q:a', '2'])
+    _encode_condensed(audio_path, merged_intervals, output_path)
     logger.info("Condensed audio saved to '%s'.", output_path)
@@ -1,13 +1,18 @@
 import importlib.resources
 import logging
+import os
 import shutil
 import subprocess
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List
 
 import genanki
-import pysrt
+import numpy as np
+
+from .srt_utils import SubtitleTable, parse_srt
 
 logger = logging.getLogger(__name__)
 
@@ -18,13 +23,66 @@ class DeckConfig:
 
     image_quality: int = 5
     image_resolution: str = '640x360'
+    image_batch_size: int = 500
     audio_batch_size: int = 100
     audio_language_code: str = 'fre'  # ISO 639-2 code (e.g., 'fre', 'jpn', 'eng')
 
 
-def _time_to_seconds(t: pysrt.SubRipTime) -> float:
-    """Converts SubRipTime to seconds."""
-    return t.hours * 3600 + t.minutes * 60 + t.seconds + t.milliseconds / 1000
+def _run_ffmpeg(command: list[str]) -> tuple[int, str]:
+    """Runs one ffmpeg command, returning its exit code and stderr."""
+    result = subprocess.run(command, capture_output=True, text=True)
+    return result.returncode, result.stderr
+
+
+def _extract_image_batch(
+    command: list[str], tmp_dir: str, renames: list[tuple[str, str]]
+) -> tuple[int, str]:
+    """Runs one batched image command, then names its outputs after their cues.
+
+    The select filter emits frames in stream order with sequential numbers, so
+    the final per-cue file names are assigned here from the known mapping
+    rather than trusting ffmpeg's output counter to line up with the cues.
+    """
+    returncode, stderr = _run_ffmpeg(command)
+    try:
+        for src_name, dest_path in renames:
+            src_path = os.path.join(tmp_dir, src_name)
+            if os.path.exists(src_path):
+                shutil.copyfile(src_path, dest_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return returncode, stderr
+
+
+def _probe_fps(video_path: Path) -> float:
+    """Returns the video stream's average frame rate via ffprobe."""
+    result = subprocess.run(
+        [
+            'ffprobe',
+            '-v',
+            'error',
+            '-select_streams',
+            'v:0',
+            '-show_entries',
+            'stream=avg_frame_rate',
+            '-of',
+            'csv=p=0',
+            str(video_path),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    try:
+        num, _, den = result.stdout.strip().partition('/')
+        fps = float(num) / float(den or 1)
+        if fps > 0:
+            return fps
+    except (ValueError, ZeroDivisionError):
+        pass
+    logger.warning(
+        "Could not probe the frame rate of '%s'; assuming 23.976 fps.", video_path
+    )
+    return 24000 / 1001
 
 
 def _initialize_anki_components(deck_name: str) -> tuple[genanki.Model, genanki.Deck]:
@@ -47,8 +105,10 @@ def _initialize_anki_components(deck_name: str) -> tuple[genanki.Model, genanki.
         css = '.card { font-family: arial; font-size: 20px; text-align: center; color: black; background-color: white; }'
 
     model_name = 'Ankigen-Model'
-    model_id = hash(model_name) % (1 << 31)
-    deck_id = hash(deck_name) % (1 << 31)
+    # hash() is salted per interpreter run; CRC32 keeps the ids stable so
+    # Anki recognizes re-exported decks instead of duplicating the model.
+    model_id = zlib.crc32(model_name.encode()) & 0x7FFFFFFF
+    deck_id = zlib.crc32(deck_name.encode()) & 0x7FFFFFFF
 
     fields = [
         {'name': 'word'},
@@ -76,62 +136,78 @@ def _initialize_anki_components(deck_name: str) -> tuple[genanki.Model, genanki.
 
 def _extract_media(
     video_path: Path,
-    subs: pysrt.SubRipFile,
+    subs: SubtitleTable,
     media_dir: Path,
     deck_name: str,
     config: DeckConfig,
-):
-    """Extracts images and audio clips from the video based on subtitles."""
+) -> set[str]:
+    """Extracts media from the video; returns the produced file names."""
     logger.info('Starting media extraction...')
-    num_subs = len(subs)
-
-    logger.info('Extracting images...')
-    for i, sub in enumerate(subs):
-        if (i + 1) % 50 == 0:
-            logger.info(f'  - Image {i + 1}/{num_subs}')
-
-        image_time = (
-            _time_to_seconds(sub.start)
-            + (_time_to_seconds(sub.end) - _time_to_seconds(sub.start)) / 2.0
-        )
-        image_path = media_dir / f'{deck_name}_{i:04d}.jpg'
-
+    num_subs = len(subs.texts)
+
+    starts_s = subs.starts_ms / 1000.0
+    ends_s = subs.ends_ms / 1000.0
+    image_times = (starts_s + ends_s) / 2.0
+    # Select exact frame indices: a time-window match can hit zero or two
+    # frames per cue depending on the frame rate, and with sequential output
+    # numbering one miss would shift every later image onto the wrong cue.
+    frame_numbers = np.rint(image_times * _probe_fps(video_path)).astype(np.int64)
+    scale = config.image_resolution.replace('x', ':')
+    image_batch_size = config.image_batch_size
+    num_image_batches = (num_subs + image_batch_size - 1) // image_batch_size
+
+    image_jobs = []
+    for i in range(num_image_batches):
+        batch_start_index = i * image_batch_size
+        batch_frames = frame_numbers[
+            batch_start_index : batch_start_index + image_batch_size
+        ].tolist()
+
+        # One decode pass per batch; eq(n, ...) emits each selected frame
+        # exactly once, in stream order, into a private temp directory.
+        unique_frames = sorted(set(batch_frames))
+        positions = {frame: pos for pos, frame in enumerate(unique_frames)}
+        expr = '+'.join(f'eq(n,{frame})' for frame in unique_frames)
+        tmp_dir = media_dir / f'.image_batch_{i}'
+        tmp_dir.mkdir()
         command = [
             'ffmpeg',
             '-y',
-            '-ss',
-            str(image_time),
+            '-threads',
+            '1',
             '-i',
             str(video_path),
-            '-vframes',
-            '1',
+            '-vf',
+            f"select='{expr}',scale={scale}",
+            '-vsync',
+            'vfr',
             '-q:v',
             str(config.image_quality),
-            '-s',
-            config.image_resolution,
-            str(image_path),
+            '-start_number',
+            '0',
+            str(tmp_dir / '%04d.jpg'),
         ]
-        try:
-            subprocess.run(command, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            logger.error(f'Failed to extract image for sub {i}: {e.stderr.strip()}')
+        renames = [
+            (
+                f'{positions[frame]:04d}.jpg',
+                str(media_dir / f'{deck_name}_{batch_start_index + j:04d}.jpg'),
+            )
+            for j, frame in enumerate(batch_frames)
+        ]
+        image_jobs.append((command, str(tmp_dir), renames))
 
-    logger.info('Extracting audio in batches...')
     audio_batch_size = config.audio_batch_size
-    num_batches = (num_subs + audio_batch_size - 1) // audio_batch_size
+    num_audio_batches = (num_subs + audio_batch_size - 1) // audio_batch_size
 
-    for i in range(num_batches):
+    audio_commands = []
+    for i in range(num_audio_batches):
         batch_start_index = i * audio_batch_size
         batch_end_index = min((i + 1) * audio_batch_size, num_subs)
-        batch_subs = subs[batch_start_index:batch_end_index]
-        logger.info(f'  - Processing audio batch {i + 1}/{num_batches}...')
-
-        command = ['ffmpeg', '-y', '-i', str(video_path)]
+        command = ['ffmpeg', '-y', '-threads', '1', '-i', str(video_path)]
 
-        for j, sub in enumerate(batch_subs):
-            sub_index = batch_start_index + j
-            start_time = _time_to_seconds(sub.start)
-            end_time = _time_to_seconds(sub.end)
+        for sub_index in range(batch_start_index, batch_end_index):
+            start_time = starts_s[sub_index]
+            end_time = ends_s[sub_index]
             audio_path = media_dir / f'{deck_name}_{sub_index:04d}.mp3'
 
             command.extend(
@@ -149,55 +225,68 @@ def _extract_media(
                     str(audio_path),
                 ]
             )
-
-        try:
-            subprocess.run(command, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            logger.error(
-                f'Audio batch {i + 1} failed. Please check if the language code '
-                f"'{config.audio_language_code}' is correct for this video file. "
-                f'Error: {e.stderr.strip()}'
-            )
+        audio_commands.append(command)
+
+    num_commands = len(image_jobs) + len(audio_commands)
+    logger.info('Running %d ffmpeg batches in parallel...', num_commands)
+
+    max_workers = min(8, os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_extract_image_batch, *job) for job in image_jobs]
+        futures += [executor.submit(_run_ffmpeg, command) for command in audio_commands]
+        for i, future in enumerate(futures):
+            returncode, stderr = future.result()
+            logger.info(f'  - Batch {i + 1}/{num_commands} done.')
+            if returncode != 0:
+                logger.error(
+                    f'Batch {i + 1} failed. If it was an audio batch, check that '
+                    f"the language code '{config.audio_language_code}' is correct "
+                    f'for this video file. Error: {stderr.strip()}'
+                )
 
     logger.info('Media extraction complete.')
+    # One directory scan after the batches replaces per-note stat calls in
+    # _create_anki_notes; batches can partially fail, so trusting the command
+    # exit codes alone would overstate what exists.
+    return {entry.name for entry in media_dir.iterdir()}
 
 
 def _create_anki_notes(
-    subs: pysrt.SubRipFile,
+    subs: SubtitleTable,
     deck_name: str,
     anki_model: genanki.Model,
     anki_deck: genanki.Deck,
     media_dir: Path,
+    existing_files: set[str],
 ) -> List[str]:
     """Creates Anki notes and returns a list of media files to include."""
     media_files: list[str] = []
     logger.info('Creating Anki notes...')
 
-    model_field_names = [field['name'] for field in anki_model.fields]
-
-    for i, sub in enumerate(subs):
+    for i, text in enumerate(subs.texts):
         base_filename = f'{deck_name}_{i:04d}'
         image_filename = f'{base_filename}.jpg'
         audio_filename = f'{base_filename}.mp3'
-        image_path = media_dir / image_filename
-        audio_path = media_dir / audio_filename
-
-        if image_path.exists() and audio_path.exists():
-            field_content = {
-                'word': sub.text.split()[0] if sub.text else '',
-                'sentence': sub.text,
-                'explanation': '',  # To be filled by another process later
-                'word_audio': '',  # To be filled by another process later
-                'explanation_audio': '',  # To be filled by another process later
-                'sentence_audio': f'[sound:{audio_filename}]',
-                'image': f'<img src="{image_filename}">',
-            }
-
-            ordered_fields = [field_content.get(name, '') for name in model_field_names]
-
-            note = genanki.Note(model=anki_model, fields=ordered_fields)
+
+        if image_filename in existing_files and audio_filename in existing_files:
+            # Positional, matching the model's field order defined in
+            # _initialize_anki_components. The empty fields (explanation and
+            # the word/explanation audio) are filled by another process later.
+            fields = [
+                text.split()[0] if text else '',  # word
+                text,  # sentence
+                '',  # explanation
+                '',  # word_audio
+                f'[sound:{audio_filename}]',  # sentence_audio
+                '',  # explanation_audio
+                f'<img src="{image_filename}">',  # image
+            ]
+
+            note = genanki.Note(model=anki_model, fields=fields)
             anki_deck.add_note(note)
-            media_files.extend([str(image_path), str(audio_path)])
+            media_files.extend(
+                [str(media_dir / image_filename), str(media_dir / audio_filename)]
+            )
 
     return media_files
 
@@ -231,11 +320,13 @@ def create_deck(video_path: Path, srt_path: Path, deck_name: str) -> Path | None
     anki_model, anki_deck = _initialize_anki_components(deck_name)
 
     logger.info('Parsing subtitles...')
-    subs = pysrt.open(str(srt_path), encoding='utf-8')
+    subs = parse_srt(srt_path)
 
-    _extract_media(video_path, subs, media_dir, deck_name, DeckConfig())
+    produced_files = _extract_media(video_path, subs, media_dir, deck_name, DeckConfig())
 
-    media_files = _create_anki_notes(subs, deck_name, anki_model, anki_deck, media_dir)
+    media_files = _create_anki_notes(
+        subs, deck_name, anki_model, anki_deck, media_dir, produced_files
+    )
 
     if anki_deck.notes:
         _generate_anki_package(anki_deck, media_files, output_deck_path)
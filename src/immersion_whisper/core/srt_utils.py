@@ -0,0 +1,67 @@
+"""Shared helpers for SubRip (SRT) subtitle files."""
+
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Timestamps and text of one SRT block; the sequence number is ignored.
+_SRT_BLOCK_RE = re.compile(
+    rb'(\d{2}):(\d{2}):(\d{2}),(\d{3})\s*-->\s*'
+    rb'(\d{2}):(\d{2}):(\d{2}),(\d{3})\s*\r?\n'
+    rb'([\s\S]*?)(?=\r?\n\r?\n|\Z)'
+)
+
+# Per-field millisecond multipliers for (hours, minutes, seconds, milliseconds).
+_MS_MULT = np.array([3_600_000, 60_000, 1_000, 1], dtype=np.int64)
+
+
+class SubtitleTable(NamedTuple):
+    """Column-oriented view of an SRT file: timestamp arrays plus texts."""
+
+    starts_ms: np.ndarray
+    ends_ms: np.ndarray
+    texts: list[str]
+
+
+def format_timestamp(seconds: float) -> str:
+    """Formats seconds into the SRT timestamp format HH:MM:SS,mmm."""
+    ms_total = int(seconds * 1000)
+    hours, rem = divmod(ms_total, 3_600_000)
+    minutes, rem = divmod(rem, 60_000)
+    secs, ms = divmod(rem, 1000)
+    return f'{hours:02d}:{minutes:02d}:{secs:02d},{ms:03d}'
+
+
+def parse_srt(srt_path: Path) -> SubtitleTable:
+    """Parses an SRT file into start/end millisecond arrays and texts."""
+    matches = _SRT_BLOCK_RE.findall(srt_path.read_bytes())
+    if not matches:
+        empty = np.empty(0, dtype=np.int64)
+        return SubtitleTable(empty, empty, [])
+
+    times = np.array(
+        [[int(group) for group in match[:8]] for match in matches], dtype=np.int64
+    )
+    texts = [match[8].strip().decode('utf-8') for match in matches]
+    return SubtitleTable(times[:, :4] @ _MS_MULT, times[:, 4:] @ _MS_MULT, texts)
+
+
+def parse_srt_file(srt_path: Path) -> list[dict]:
+    """Parses an SRT file and returns a list of subtitle segments."""
+    if not srt_path.is_file():
+        logger.error('SRT file not found at %s', srt_path)
+        sys.exit(1)
+
+    subs = parse_srt(srt_path)
+    starts = (subs.starts_ms / 1000.0).tolist()
+    ends = (subs.ends_ms / 1000.0).tolist()
+    return [
+        {'start': start, 'end': end, 'text': text}
+        for start, end, text in zip(starts, ends, subs.texts)
+    ]
@@ -1,137 +1,247 @@
+import hashlib
+import json
 import logging
-import random
-import re
+import os
 import sys
+from itertools import chain
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import spacy
-
-from ..config import SETTINGS
-from ..database.models import Lemma, Subtitle, SubtitleLemma, db
+from peewee import chunked
+from spacy.attrs import IS_ALPHA, IS_PUNCT, IS_STOP, LEMMA
+
+from ..config import get_settings
+from ..database.models import (
+    Lemma,
+    LemmatizationCache,
+    Subtitle,
+    SubtitleLemma,
+    db,
+)
+from .srt_utils import parse_srt_file
 
 logger = logging.getLogger(__name__)
 
 _NLP_MODEL = None
+_NLP_ON_GPU = False
+
+
+def _configure_torch(on_gpu: bool):
+    """Tunes torch for transformer pipelines; a no-op without torch installed."""
+    try:
+        import torch
+    except ImportError:
+        return
+
+    if on_gpu:
+        # Lets Ampere+ tensor cores run the fp32 matmuls as TF32.
+        torch.set_float32_matmul_precision('high')
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+    else:
+        torch.set_num_threads(os.cpu_count() or 1)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Already initialized elsewhere; keep whatever is in place.
+            pass
 
 
-def _get_nlp():
-    """Lazily loads the spaCy model."""
-    global _NLP_MODEL
-    if _NLP_MODEL is None:
-        _NLP_MODEL = spacy.load(
-            SETTINGS.sub_processor.spacy_model, disable=['parser', 'ner']
-        )
-    return _NLP_MODEL
+def _load_nlp(model_name: str):
+    """Loads the spaCy pipeline, preferring a serialized snapshot on disk.
 
+    Restoring one binary blob skips walking the model package directory,
+    which cuts several seconds off every CLI start after the first.
+    """
+    cache_dir = Path.home() / '.cache' / 'immersion_whisper'
+    key = f'{model_name}-spacy{spacy.__version__}'
+    bytes_path = cache_dir / f'{key}.bin'
+    config_path = cache_dir / f'{key}.cfg'
 
-def parse_srt_file(srt_path: Path) -> list[dict]:
-    """Parses an SRT file and returns a list of subtitle segments."""
-    segments = []
-
-    if not srt_path.is_file():
-        logger.error('SRT file not found at %s', srt_path)
-        sys.exit(1)
-
-    with open(srt_path, 'r', encoding='utf-8') as f:
-        content = f.read().strip()
-
-    # Regex to find blocks: number, timestamp, and text
-    block_pattern = re.compile(
-        r'(\d+)\s*?\n'  # Sequence number
-        r'(\d{2}:\d{2}:\d{2},\d{3})\s*?-->\s*?(\d{2}:\d{2}:\d{2},\d{3})\s*?\n'  # Timestamps
-        r'([\s\S]*?)(?=\n\n|\Z)',  # Subtitle text
-        re.MULTILINE,
-    )
-
-    for match in block_pattern.finditer(content):
-        _, start_time_str, end_time_str, text = match.groups()
-        segments.append(
-            {
-                'start': srt_time_to_seconds(start_time_str),
-                'end': srt_time_to_seconds(end_time_str),
-                'text': text.strip(),
-            }
+    if bytes_path.is_file() and config_path.is_file():
+        try:
+            config = spacy.util.load_config(config_path)
+            lang_cls = spacy.util.get_lang_class(config['nlp']['lang'])
+            nlp = lang_cls.from_config(config)
+            nlp.from_bytes(bytes_path.read_bytes())
+            return nlp
+        except Exception:
+            logger.warning('Stale spaCy snapshot in %s; reloading the model.', cache_dir)
+
+    try:
+        nlp = spacy.load(model_name, disable=['parser', 'ner'])
+    except OSError:
+        logger.error(
+            "spaCy model '%s' is not installed. Run: python -m spacy download %s",
+            model_name,
+            model_name,
         )
-    return segments
+        raise
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        config_path.write_text(nlp.config.to_str())
+        bytes_path.write_bytes(nlp.to_bytes())
+    except OSError:
+        logger.warning('Could not write a spaCy snapshot to %s', cache_dir)
+    return nlp
 
 
-def srt_time_to_seconds(time_str: str) -> float:
-    """Converts an SRT time string HH:MM:SS,ms to seconds."""
-    hours, minutes, seconds_milliseconds = time_str.split(':')
-    seconds, milliseconds = seconds_milliseconds.replace(',', ' ').split()
-    return (
-        int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(milliseconds) / 1000
-    )
+def _get_nlp():
+    """Lazily loads the spaCy model, preferring the GPU when available."""
+    global _NLP_MODEL, _NLP_ON_GPU
+    if _NLP_MODEL is None:
+        _NLP_ON_GPU = spacy.prefer_gpu()
+        _configure_torch(_NLP_ON_GPU)
+        _NLP_MODEL = _load_nlp(get_settings().sub_processor.spacy_model)
+    return _NLP_MODEL
 
 
 class SubtitleProcessor:
     def __init__(self):
-        self.subtitles_data: list[dict] = []
-        self.lemma_cache: dict[str, int] | None = None
+        self.subtitle_frames: list[pd.DataFrame] = []
+        self.lemma_cache: pd.Series | None = None
 
     def _load_cache_if_needed(self):
         """Loads the lemma cache, assuming the database and tables already exist."""
         if self.lemma_cache is None:
             try:
-                self.lemma_cache = {
-                    lemma.text: lemma.id for lemma in Lemma.select(Lemma.id, Lemma.text)
-                }
+                # A text-indexed Series keeps the set-diff against known lemmas
+                # and the lemma-id .map() lookups vectorized. tuples() skips
+                # building a Lemma instance per row; iterator() skips the
+                # peewee result cache.
+                self.lemma_cache = pd.Series(
+                    dict(Lemma.select(Lemma.text, Lemma.id).tuples().iterator()),
+                    dtype='int64',
+                )
             except Exception as e:
                 logger.error(f'Error loading lemma cache: {e}')
                 raise
 
     def add(self, text: str, episode: int, start: float, end: float):
         """Adds raw subtitle data to the internal storage."""
-        self.subtitles_data.append(
-            {
-                'text': text,
-                'episode_number': episode,
-                'starts_at': round(start, 3),
-                'ends_at': round(end, 3),
-            }
+        self.add_many([{'text': text, 'start': start, 'end': end}], episode)
+
+    def add_many(self, segments: list[dict], episode: int):
+        """Adds a batch of parsed segments to the internal storage."""
+        if not segments:
+            return
+        df = pd.DataFrame(segments)
+        df['text'] = df['text'].str.lstrip()
+        df['episode_number'] = episode
+        df['starts_at'] = df['start'].round(3)
+        df['ends_at'] = df['end'].round(3)
+        self.subtitle_frames.append(
+            df[['text', 'episode_number', 'starts_at', 'ends_at']]
         )
 
     def _lemmatize_batch(self, texts: list[str]) -> list[list[str]]:
-        """Lemmatizes a batch of texts."""
-        nlp = _get_nlp()
-        lemmas_list: list[list[str]] = []
-        for doc in nlp.pipe(texts):
-            lemmas_list.append(
-                [
-                    token.lemma_.lower()
-                    for token in doc
-                    if token.is_alpha and not token.is_stop and not token.is_punct
+        """Lemmatizes a batch of texts, reusing cached results for known lines."""
+        # The cache outlives --reset, so keys carry the model name: lemmas
+        # produced by one spaCy model must not be served for another.
+        prefix = f'{get_settings().sub_processor.spacy_model}:'.encode()
+        keys = [
+            hashlib.sha256(prefix + text.encode('utf-8')).hexdigest()
+            for text in texts
+        ]
+        resolved: dict[str, list[str]] = {}
+
+        # Recap lines, interjections, and laugh tracks repeat across episodes;
+        # anything lemmatized before is served from the persistent cache.
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), 500):
+            cached = LemmatizationCache.select().where(
+                LemmatizationCache.text_hash.in_(unique_keys[i : i + 500])
+            )
+            for entry in cached:
+                resolved[entry.text_hash] = [
+                    sys.intern(lemma) for lemma in json.loads(entry.lemmas)
                 ]
+
+        misses = {
+            key: text
+            for key, text in zip(keys, texts)
+            if key not in resolved
+        }
+        if misses:
+            nlp = _get_nlp()
+            settings = get_settings().sub_processor
+            # On GPU the forward pass is already batched; on CPU spread the
+            # docs across worker processes instead.
+            n_process = settings.n_process
+            if n_process <= 0:
+                n_process = 1 if _NLP_ON_GPU else max(1, (os.cpu_count() or 2) // 2)
+            new_entries = []
+            docs = nlp.pipe(
+                list(misses.values()),
+                batch_size=settings.batch_size,
+                n_process=n_process,
             )
-        return lemmas_list
+            strings = nlp.vocab.strings
+            for key, doc in zip(misses, docs):
+                # Filter tokens with a C-level mask instead of per-token
+                # attribute lookups; only surviving lemma hashes are resolved.
+                attrs = doc.to_array([LEMMA, IS_ALPHA, IS_STOP, IS_PUNCT])
+                mask = (attrs[:, 1] == 1) & (attrs[:, 2] == 0) & (attrs[:, 3] == 0)
+                lemmas = [
+                    sys.intern(strings[int(h)].lower()) for h in attrs[mask, 0]
+                ]
+                resolved[key] = lemmas
+                new_entries.append({'text_hash': key, 'lemmas': json.dumps(lemmas)})
+
+            with db.atomic():
+                # Two fields per row, so 450 rows stays under the
+                # 999-parameter limit.
+                for entry_chunk in chunked(new_entries, 450):
+                    LemmatizationCache.insert_many(
+                        entry_chunk
+                    ).on_conflict_ignore().execute()
+
+        return [resolved[key] for key in keys]
 
     def process(self):
         """Processes the entire batch of subtitles."""
         self._load_cache_if_needed()
         logger.info('Processing subtitles...')
 
-        if not self.subtitles_data or self.lemma_cache is None:
+        if not self.subtitle_frames or self.lemma_cache is None:
             return
 
         try:
-            df = pd.DataFrame(self.subtitles_data)
+            df = pd.concat(self.subtitle_frames, ignore_index=True)
             df['lemmas'] = self._lemmatize_batch(df['text'].tolist())
 
+            # Flatten the lemma lists once up front; np.repeat over the list
+            # lengths later aligns subtitle ids with their lemmas without the
+            # exploded-DataFrame allocation.
+            lemma_counts = df['lemmas'].str.len().to_numpy()
+            flat_lemmas = pd.Series(list(chain.from_iterable(df['lemmas'])))
+
             with db.atomic():
                 # Identify and insert new lemmas
-                exploded_df = df.explode('lemmas').dropna(subset=['lemmas'])
-                all_lemmas_in_batch = set(exploded_df['lemmas'])
-                new_lemma_texts = all_lemmas_in_batch - self.lemma_cache.keys()
+                new_lemma_texts = pd.Index(flat_lemmas.unique()).difference(
+                    self.lemma_cache.index
+                )
 
-                if new_lemma_texts:
+                if not new_lemma_texts.empty:
                     new_lemma_records = [{'text': t} for t in new_lemma_texts]
-                    Lemma.insert_many(new_lemma_records).execute()
-
-                    # Update cache with the new lemmas
-                    newly_added = Lemma.select().where(Lemma.text.in_(new_lemma_texts))
-                    for lemma in newly_added:
-                        self.lemma_cache[lemma.text] = lemma.id
+                    for lemma_chunk in chunked(new_lemma_records, 450):
+                        Lemma.insert_many(lemma_chunk).execute()
+
+                    # Update cache with the new lemmas; the IN list binds one
+                    # parameter per text, so chunk it like the inserts.
+                    added: dict[str, int] = {}
+                    for text_chunk in chunked(list(new_lemma_texts), 450):
+                        added.update(
+                            Lemma.select(Lemma.text, Lemma.id)
+                            .where(Lemma.text.in_(text_chunk))
+                            .tuples()
+                            .iterator()
+                        )
+                    self.lemma_cache = pd.concat(
+                        [self.lemma_cache, pd.Series(added, dtype='int64')]
+                    )
 
                 # Insert subtitles
                 sub_records = df[
@@ -139,61 +249,86 @@ class SubtitleProcessor:
                 ].to_dict('records')
                 if not sub_records:
                     return
-                Subtitle.insert_many(sub_records).execute()
-
-                # Fetch inserted subtitles to get their DB IDs
-                fetched_subs = Subtitle.select().where(
-                    Subtitle.text.in_(df['text'].unique().tolist())
+                # RETURNING hands back the auto-assigned IDs in insert order,
+                # so no re-SELECT (keyed on non-unique text) is needed. At 4
+                # bound parameters per row, chunks of 200 stay under SQLite's
+                # 999-parameter limit.
+                subtitle_ids: list[int] = []
+                for record_chunk in chunked(sub_records, 200):
+                    inserted = Subtitle.insert_many(record_chunk).returning(
+                        Subtitle.id
+                    ).execute()
+                    subtitle_ids.extend(row.id for row in inserted)
+                df['subtitle_id'] = subtitle_ids
+
+                # Prepare and insert many-to-many relationships: repeating
+                # each subtitle id by its lemma count lines it up with the
+                # flattened lemma stream, with no explode in between.
+                rels_df = pd.DataFrame(
+                    {
+                        'subtitle_id': np.repeat(
+                            df['subtitle_id'].to_numpy(), lemma_counts
+                        ),
+                        'lemma_id': flat_lemmas.map(self.lemma_cache),
+                    }
                 )
-                sub_id_map = {
-                    (s.text, s.episode_number, s.starts_at, s.ends_at): s.id
-                    for s in fetched_subs
-                }
-                df['subtitle_id'] = df.apply(
-                    lambda row: sub_id_map.get(
-                        (
-                            row['text'],
-                            row['episode_number'],
-                            row['starts_at'],
-                            row['ends_at'],
-                        )
-                    ),  # type: ignore
-                    axis=1,
+                if rels_df.empty:
+                    return
+                rel_tuples = list(
+                    zip(
+                        rels_df['subtitle_id'].tolist(),
+                        rels_df['lemma_id'].tolist(),
+                    )
                 )
+                for rel_chunk in chunked(rel_tuples, 400):
+                    SubtitleLemma.insert_many(
+                        rel_chunk,
+                        fields=[SubtitleLemma.subtitle, SubtitleLemma.lemma],
+                    ).on_conflict_ignore().execute()
+
+                # Recount frequencies for the lemmas touched by this batch in
+                # one aggregate pass per chunk — the per-row triggers this
+                # replaces fired thousands of UPDATEs during insert_many. The
+                # recount is also immune to relations skipped by
+                # on_conflict_ignore.
+                touched_lemma_ids = rels_df['lemma_id'].unique()
+                for id_chunk in chunked(touched_lemma_ids.tolist(), 450):
+                    placeholders = ','.join(['?'] * len(id_chunk))
+                    db.execute_sql(
+                        'UPDATE lemma SET frequency = ('
+                        'SELECT COUNT(*) FROM subtitlelemma '
+                        'WHERE lemma_id = lemma.id) '
+                        f'WHERE id IN ({placeholders})',
+                        [int(lemma_id) for lemma_id in id_chunk],
+                    )
 
-                # Prepare and insert many-to-many relationships using the DataFrame
-                rels_df = df.explode('lemmas').dropna(subset=['lemmas', 'subtitle_id'])
-                if not rels_df.empty:
-                    rels_df['lemma_id'] = rels_df['lemmas'].map(self.lemma_cache)
-                    rels_to_insert = [
-                        {'subtitle': r['subtitle_id'], 'lemma': r['lemma_id']}
-                        for r in rels_df[['subtitle_id', 'lemma_id']].to_dict('records')
-                    ]
-                    if rels_to_insert:
-                        SubtitleLemma.insert_many(rels_to_insert).execute()
-
-                # Select a random associated subtitle for every lemma in the batch
-                lemmas_in_batch_ids = {
-                    self.lemma_cache[lemma_text] for lemma_text in all_lemmas_in_batch
-                }
-                lemma_to_subtitles_map = (
-                    rels_df.groupby('lemma_id')['subtitle_id'].apply(list).to_dict()
+                # Select a random associated subtitle for every lemma in the
+                # batch. The cythonized groupby sample picks one row per group
+                # without materializing per-lemma Python lists.
+                picks = rels_df.groupby('lemma_id', sort=False).sample(n=1)
+                pick_rows = list(
+                    picks[['lemma_id', 'subtitle_id']].itertuples(
+                        index=False, name=None
+                    )
                 )
-                lemmas_to_update = [
-                    Lemma(
-                        id=lemma_id, card_subtitle=random.choice(associated_subtitles)
+                # bulk_update expands to a CASE-WHEN per row; a VALUES-backed
+                # CTE updates every lemma of a chunk in one statement. Chunks
+                # of 450 pairs stay under SQLite's 999-parameter limit.
+                for chunk in chunked(pick_rows, 450):
+                    values_sql = ','.join(['(?,?)'] * len(chunk))
+                    db.execute_sql(
+                        'WITH v(id, sid) AS (VALUES ' + values_sql + ') '
+                        'UPDATE lemma SET card_subtitle_id = '
+                        '(SELECT sid FROM v WHERE v.id = lemma.id) '
+                        'WHERE id IN (SELECT id FROM v)',
+                        [int(value) for pair in chunk for value in pair],
                     )
-                    for lemma_id in lemmas_in_batch_ids
-                    if (associated_subtitles := lemma_to_subtitles_map.get(lemma_id))
-                ]
-                if lemmas_to_update:
-                    Lemma.bulk_update(lemmas_to_update, fields=[Lemma.card_subtitle])
 
         except Exception as e:
             logger.error(f'Batch processing error: {e}')
             raise
         finally:
-            self.subtitles_data.clear()
+            self.subtitle_frames.clear()
 
 
 _processor = SubtitleProcessor()
@@ -204,6 +339,11 @@ def process_subtitle(text: str, episode: int, start: float, end: float):
     _processor.add(text, episode, start, end)
 
 
+def process_segments(segments: list[dict], episode: int):
+    """Public API to add a batch of parsed segments to the batch."""
+    _processor.add_many(segments, episode)
+
+
 def flush_batch():
     """Public API to process the current batch."""
     _processor.process()
@@ -212,10 +352,13 @@ def flush_batch():
 def process_subtitles(srt_path: Path):
     """Processes subtitles from an SRT file and stores them in the database."""
     episode_number = int(srt_path.stem) if srt_path.stem.isnumeric() else 0
-    segments = parse_srt_file(srt_path)
-    for segment in segments:
-        process_subtitle(
-            segment['text'], episode_number, segment['start'], segment['end']
+    # The database persists between runs, so re-running on a directory must
+    # not ingest the same episode twice (doubling rows and frequencies).
+    if Subtitle.select().where(Subtitle.episode_number == episode_number).exists():
+        logger.info(
+            "Episode %d already ingested. Skipping '%s'.", episode_number, srt_path
         )
+        return
+    process_segments(parse_srt_file(srt_path), episode_number)
     flush_batch()
     logger.info("Subtitles at '%s' processed and stored.", srt_path)
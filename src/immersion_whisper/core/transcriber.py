@@ -1,71 +1,87 @@
 import logging
-import sys
-from datetime import timedelta
+from functools import lru_cache
 from pathlib import Path
 
-from ..config import SETTINGS
+import numpy as np
+
+from ..config import get_settings
+from .srt_utils import format_timestamp
 
 fw_logger = logging.getLogger('faster_whisper')
 fw_logger.setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
-def _format_timestamp(seconds: float) -> str:
-    """Formats seconds into SRT timestamp format HH:MM:SS,ms."""
-    delta = timedelta(seconds=seconds)
-    return f'{delta.seconds // 3600:02d}:{delta.seconds // 60 % 60:02d}:{delta.seconds % 60:02d},{delta.microseconds // 1000:03d}'
+@lru_cache(maxsize=2)
+def _get_model(name: str, device: str, compute_type: str, device_index: int):
+    """Returns a cached WhisperModel, so batch runs load the weights once."""
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(
+        name, device=device, compute_type=compute_type, device_index=device_index
+    )
 
 
-def transcribe(audio_path: Path, srt_path: Path):
-    """Transcribes the audio from the input file and generates an SRT file."""
-    if not audio_path.is_file():
-        logger.error("Input audio file not found at '%s'", audio_path)
-        sys.exit(1)
+def transcribe(audio: np.ndarray, srt_path: Path):
+    """Transcribes the decoded audio samples and generates an SRT file."""
     if srt_path.is_file():
         logger.info(
             "SRT file already exists at '%s'. Skipping transcription.", srt_path
         )
         return
 
-    logger.info('Loading %s model...', SETTINGS.transcriber.model.name)
+    settings = get_settings()
+    logger.info('Loading %s model...', settings.transcriber.model.name)
 
-    from faster_whisper import WhisperModel
     from faster_whisper.transcribe import VadOptions
 
-    model = WhisperModel(
-        SETTINGS.transcriber.model.name,
-        device=SETTINGS.transcriber.model.device,
-        compute_type=SETTINGS.transcriber.model.compute_type,
-        device_index=0,
+    model = _get_model(
+        settings.transcriber.model.name,
+        settings.transcriber.model.device,
+        settings.transcriber.model.compute_type,
+        0,
     )
     vad_params = VadOptions(
-        threshold=SETTINGS.transcriber.vad.threshold,
-        neg_threshold=SETTINGS.transcriber.vad.neg_threshold,
-        min_speech_duration_ms=SETTINGS.transcriber.vad.min_speech_duration_ms,
-        max_speech_duration_s=SETTINGS.transcriber.vad.max_speech_duration_s,
-        min_silence_duration_ms=SETTINGS.transcriber.vad.min_silence_duration_ms,
-        speech_pad_ms=SETTINGS.transcriber.vad.speech_pad_ms,
+        threshold=settings.transcriber.vad.threshold,
+        neg_threshold=settings.transcriber.vad.neg_threshold,
+        min_speech_duration_ms=settings.transcriber.vad.min_speech_duration_ms,
+        max_speech_duration_s=settings.transcriber.vad.max_speech_duration_s,
+        min_silence_duration_ms=settings.transcriber.vad.min_silence_duration_ms,
+        speech_pad_ms=settings.transcriber.vad.speech_pad_ms,
     )
+    # Batching VAD-segmented chunks through the encoder amortizes kernel
+    # launches. The batched pipeline needs VAD to produce its clip
+    # timestamps and raises on long audio without it, so transcribing with
+    # VAD off uses the plain sequential path.
+    extra_args = {}
+    if settings.transcriber.vad.active:
+        from faster_whisper import BatchedInferencePipeline
+
+        pipeline = BatchedInferencePipeline(model=model)
+        extra_args['batch_size'] = settings.transcriber.batch_size
+    else:
+        pipeline = model
+
     logger.info(
         'Starting transcription (VAD: %s)...',
-        'ON' if SETTINGS.transcriber.vad.active else 'OFF',
+        'ON' if settings.transcriber.vad.active else 'OFF',
     )
-    segments_iter, _ = model.transcribe(
-        str(audio_path),
-        language=SETTINGS.transcriber.language,
+    segments_iter, _ = pipeline.transcribe(
+        audio,
+        language=settings.transcriber.language,
         word_timestamps=True,
         log_progress=True,
-        hotwords=', '.join(SETTINGS.transcriber.hotwords),
-        vad_filter=SETTINGS.transcriber.vad.active,
-        vad_parameters=vad_params if SETTINGS.transcriber.vad.active else None,
-        initial_prompt=SETTINGS.transcriber.initial_prompt,
+        hotwords=', '.join(settings.transcriber.hotwords),
+        vad_filter=settings.transcriber.vad.active,
+        vad_parameters=vad_params if settings.transcriber.vad.active else None,
+        initial_prompt=settings.transcriber.initial_prompt,
+        **extra_args,
     )
-    segments = [
-        {'text': seg.text, 'start': seg.start, 'end': seg.end} for seg in segments_iter
-    ]
+    # The model yields segments lazily; writing inside the loop streams the
+    # SRT to disk during inference instead of buffering the transcript.
     with srt_path.open('w', encoding='utf-8') as srt_file:
-        for i, seg in enumerate(segments):
+        for i, seg in enumerate(segments_iter):
             srt_file.write(
-                f'{i + 1}\n{_format_timestamp(seg["start"])} --> {_format_timestamp(seg["end"])}\n{seg["text"].lstrip()}\n\n'
+                f'{i + 1}\n{format_timestamp(seg.start)} --> {format_timestamp(seg.end)}\n{seg.text.lstrip()}\n\n'
             )
     logger.info("Transcription complete. SRT file saved to '%s'", srt_path)
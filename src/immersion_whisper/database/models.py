@@ -1,6 +1,17 @@
 import peewee as pw
 
-db = pw.SqliteDatabase('subtitles.db')
+# WAL avoids a full fsync per commit during batch processing; the cache and
+# mmap sizes (256 MiB each) keep hot pages out of repeated disk reads.
+db = pw.SqliteDatabase(
+    'subtitles.db',
+    pragmas={
+        'journal_mode': 'wal',
+        'synchronous': 'NORMAL',
+        'temp_store': 'memory',
+        'cache_size': -262144,
+        'mmap_size': 268435456,
+    },
+)
 
 
 class BaseModel(pw.Model):
@@ -15,6 +26,10 @@ class Subtitle(BaseModel):
     starts_at = pw.FloatField()
     ends_at = pw.FloatField()
 
+    class Meta:
+        # Episode/time range lookups would otherwise full-scan the table.
+        indexes = ((('episode_number', 'starts_at'), False),)
+
 
 class Lemma(BaseModel):
     id = pw.AutoField()
@@ -29,3 +44,14 @@ class SubtitleLemma(BaseModel):
     id = pw.AutoField()
     subtitle = pw.ForeignKeyField(Subtitle, backref='lemmas')
     lemma = pw.ForeignKeyField(Lemma, backref='subtitles')
+
+    class Meta:
+        # Backs on_conflict_ignore during bulk inserts with an index lookup.
+        indexes = ((('subtitle', 'lemma'), True),)
+
+
+class LemmatizationCache(BaseModel):
+    """Maps a hash of raw subtitle text to its JSON-encoded lemma list."""
+
+    text_hash = pw.CharField(unique=True)
+    lemmas = pw.TextField()
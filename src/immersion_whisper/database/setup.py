@@ -1,36 +1,54 @@
 import logging
 
-from .models import Lemma, Subtitle, SubtitleLemma, db
+from .models import Lemma, LemmatizationCache, Subtitle, SubtitleLemma, db
 
 logger = logging.getLogger(__name__)
 
+# Bump when the schema changes; read back via PRAGMA user_version to gate
+# future migrations instead of dropping tables.
+SCHEMA_VERSION = 2
 
-def create_triggers():
-    """Creates triggers for automatic frequency updates."""
-    increment_trigger = """
-    CREATE TRIGGER IF NOT EXISTS increment_frequency
-    AFTER INSERT ON subtitlelemma
-    FOR EACH ROW
-    BEGIN
-        UPDATE lemma SET frequency = frequency + 1 WHERE id = NEW.lemma_id;
-    END;
-    """
-    decrease_trigger = """
-    CREATE TRIGGER IF NOT EXISTS decrease_frequency
-    AFTER DELETE ON subtitlelemma
-    FOR EACH ROW
-    BEGIN
-        UPDATE lemma SET frequency = frequency - 1 WHERE id = OLD.lemma_id;
-    END;
+
+def _migrate(from_version: int):
+    """Brings databases created before SCHEMA_VERSION up to date.
+
+    create_tables(safe=True) skips tables that already exist, so schema
+    changes must be applied here for databases left behind by older code.
     """
-    db.execute_sql(increment_trigger)
-    db.execute_sql(decrease_trigger)
+    if from_version < 2:
+        # Old inserts could duplicate a subtitle/lemma pair; the unique
+        # index cannot be created (and on_conflict_ignore cannot dedupe)
+        # until those rows are collapsed and frequencies recounted.
+        db.execute_sql(
+            'DELETE FROM subtitlelemma WHERE id NOT IN '
+            '(SELECT MIN(id) FROM subtitlelemma GROUP BY subtitle_id, lemma_id)'
+        )
+        db.execute_sql(
+            'UPDATE lemma SET frequency = (SELECT COUNT(*) FROM subtitlelemma '
+            'WHERE lemma_id = lemma.id)'
+        )
+        # Index names match what peewee generates for the Meta definitions,
+        # so fresh databases no-op here.
+        db.execute_sql(
+            'CREATE INDEX IF NOT EXISTS subtitle_episode_number_starts_at '
+            'ON subtitle (episode_number, starts_at)'
+        )
+        db.execute_sql(
+            'CREATE UNIQUE INDEX IF NOT EXISTS subtitlelemma_subtitle_id_lemma_id '
+            'ON subtitlelemma (subtitle_id, lemma_id)'
+        )
+        # Frequencies are maintained in bulk by the sub processor now.
+        db.execute_sql('DROP TRIGGER IF EXISTS increment_frequency')
+        db.execute_sql('DROP TRIGGER IF EXISTS decrease_frequency')
 
 
 def _setup_database_elements():
-    """Shared logic for creating tables and triggers."""
-    db.create_tables([Subtitle, Lemma, SubtitleLemma], safe=True)
-    create_triggers()
+    """Shared logic for creating tables and applying schema migrations."""
+    from_version = db.execute_sql('PRAGMA user_version').fetchone()[0]
+    db.create_tables([Subtitle, Lemma, SubtitleLemma, LemmatizationCache], safe=True)
+    if from_version < SCHEMA_VERSION:
+        _migrate(from_version)
+        db.execute_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
 
 
 def init_db():
@@ -1,19 +1,20 @@
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from dotenv import load_dotenv
 
 from .args import parse_args
-from .config import SETTINGS
+from .config import get_settings
 from .core.condenser import condense
 from .core.deck_creator import create_deck
 from .core.sub_processor import process_subtitles
 from .core.transcriber import transcribe
 from .core.translator import translate
-from .database.setup import reset_db
-from .utils import extract_audio, get_media_files, is_audio
+from .database.setup import init_db, reset_db
+from .utils import extract_audio, get_media_files, is_audio, load_audio
 
 load_dotenv()
 logging.basicConfig(
@@ -22,54 +23,90 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def run_pipeline(file_path: Path, output_dir: Path):
-    """Runs the main pipeline on one file with the selected steps."""
+def _condense_file(file_path: Path, srt_path: Path, output_path: Path):
+    """Extracts the audio track and condenses it; runs as a background stage."""
+    # Condensing re-encodes with ffmpeg, which wants a file input.
     audio_path = extract_audio(file_path) if not is_audio(file_path) else file_path
+    condense(audio_path, srt_path, output_path)
+    if audio_path != file_path:
+        audio_path.unlink(missing_ok=True)
+
+
+def run_pipeline(file_path: Path, output_dir: Path, audio=None):
+    """Runs the main pipeline on one file with the selected steps."""
+    settings = get_settings()
     srt_path = output_dir / f'{file_path.stem}.srt'
 
-    if SETTINGS.pipeline.transcribe:
-        transcribe(audio_path, srt_path)
+    if settings.pipeline.transcribe:
+        if audio is None:
+            audio = load_audio(file_path)
+        transcribe(audio, srt_path)
 
-    if SETTINGS.pipeline.translate:
+    if settings.pipeline.translate:
         translated_srt_path = file_path.with_suffix('.srt')
         translate(srt_path, translated_srt_path)
 
-    if SETTINGS.pipeline.condense:
-        if not (condensed_dir := os.getenv('CONDENSED_AUDIO_DIR')):
-            logger.error(
-                'CONDENSED_AUDIO_DIR environment variable is not set. Exiting.'
+    # Condensing only reads the finished SRT, so its ffmpeg work can run in
+    # the background while sub processing and deck creation proceed; the
+    # executor's exit joins it before the pipeline reports this file done.
+    condense_future = None
+    with ThreadPoolExecutor(max_workers=1) as stage_pool:
+        if settings.pipeline.condense:
+            if not (condensed_dir := os.getenv('CONDENSED_AUDIO_DIR')):
+                logger.error(
+                    'CONDENSED_AUDIO_DIR environment variable is not set. Exiting.'
+                )
+                sys.exit(1)
+            condensed_audio_path = Path(condensed_dir) / f'{srt_path.stem}.mp3'
+            condense_future = stage_pool.submit(
+                _condense_file, file_path, srt_path, condensed_audio_path
             )
-            sys.exit(1)
-        condensed_audio_path = Path(condensed_dir) / f'{srt_path.stem}.mp3'
-        condense(audio_path, srt_path, condensed_audio_path)
 
-    if SETTINGS.pipeline.process_subs:
-        process_subtitles(srt_path)
+        if settings.pipeline.process_subs:
+            process_subtitles(srt_path)
 
-    if SETTINGS.pipeline.create_deck:
-        deck_name = file_path.stem
-        create_deck(file_path, srt_path, deck_name)
+        if settings.pipeline.create_deck:
+            deck_name = file_path.stem
+            create_deck(file_path, srt_path, deck_name)
 
-    if audio_path != file_path:
-        audio_path.unlink(missing_ok=True)
+    if condense_future is not None:
+        condense_future.result()
 
 
 def main():
     args = parse_args()
+    if args.vad is not None:
+        get_settings().transcriber.vad.active = args.vad
 
     output_dir = Path('output')
     output_dir.mkdir(exist_ok=True)
 
-    if SETTINGS.pipeline.process_subs:
-        reset_db()
+    if get_settings().pipeline.process_subs:
+        # Accumulated lemma data survives between runs; --reset opts into the
+        # old drop-and-recreate behavior.
+        reset_db() if args.reset else init_db()
 
     input_path = Path(args.input_path)
     if input_path.is_dir():
         media_file_paths = get_media_files(input_path)
         logger.info("Found %d media files in '%s'.", len(media_file_paths), input_path)
-        for file_path in media_file_paths:
-            logger.info('---------------- %s ----------------', file_path)
-            run_pipeline(file_path, output_dir)
+        # A single worker decodes the next file's audio while the pipeline
+        # (mainly transcription) is busy with the current one.
+        prefetch = get_settings().pipeline.transcribe
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            next_audio = None
+            for i, file_path in enumerate(media_file_paths):
+                audio_future = next_audio
+                if audio_future is None and prefetch:
+                    audio_future = pool.submit(load_audio, file_path)
+                if prefetch and i + 1 < len(media_file_paths):
+                    next_audio = pool.submit(load_audio, media_file_paths[i + 1])
+                logger.info('---------------- %s ----------------', file_path)
+                run_pipeline(
+                    file_path,
+                    output_dir,
+                    audio=audio_future.result() if audio_future else None,
+                )
     else:
         run_pipeline(input_path, output_dir)
 
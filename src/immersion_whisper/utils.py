@@ -1,10 +1,16 @@
 import logging
-import mimetypes
+import sys
 import tempfile
 from pathlib import Path
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+AUDIO_EXTS = frozenset({'.mp3', '.m4a', '.wav', '.flac', '.opus', '.ogg'})
+VIDEO_EXTS = frozenset({'.mkv', '.mp4', '.mov', '.webm', '.avi'})
+MEDIA_EXTS = AUDIO_EXTS | VIDEO_EXTS
+
 
 def extract_audio(input_path: Path, lang: str = 'fre') -> Path:
     """Extracts audio from the input video file using ffmpeg."""
@@ -27,22 +33,47 @@ def extract_audio(input_path: Path, lang: str = 'fre') -> Path:
         return input_path
 
 
+def load_audio(input_path: Path, lang: str = 'fre') -> np.ndarray:
+    """Decodes the file's audio track into Whisper's 16 kHz mono float32 format.
+
+    The samples are piped straight out of ffmpeg, so no intermediate WAV is
+    written to disk and faster-whisper skips its own decode pass.
+    """
+    if not input_path.is_file():
+        logger.error("Input file not found at '%s'", input_path)
+        sys.exit(1)
+    logger.info("Decoding '%s' audio track from %s file...", lang, input_path.suffix)
+
+    import ffmpeg
+
+    output_args = {'format': 's16le', 'ac': 1, 'ar': 16000}
+    try:
+        stdout, _ = (
+            ffmpeg.input(str(input_path))
+            .output('pipe:', map=f'0:a:m:language:{lang}', **output_args)
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error:
+        # No track tagged with the language (e.g. plain audio files); fall
+        # back to the default stream, mirroring extract_audio.
+        stdout, _ = (
+            ffmpeg.input(str(input_path))
+            .output('pipe:', **output_args)
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+
+    return np.frombuffer(stdout, np.int16).astype(np.float32) / 32768.0
+
+
 def is_audio(file_path: Path) -> bool:
-    """Determines if the provided file path is an audio based on its MIME type."""
-    mime_type, _ = mimetypes.guess_type(file_path)
-    if mime_type:
-        return mime_type.startswith('audio/')
-    return False
+    """Determines if the provided file path is an audio file by its extension."""
+    return file_path.suffix.lower() in AUDIO_EXTS
 
 
 def get_media_files(dir_path: Path) -> list[Path]:
-    """Finds all media (video and audio) files in a directory and its subdirectories."""
-    media_files = []
-    for item in dir_path.glob('*'):
-        if item.is_file():
-            mime_type, _ = mimetypes.guess_type(item)
-            if mime_type and (
-                mime_type.startswith('video/') or mime_type.startswith('audio/')
-            ):
-                media_files.append(item)
-    return media_files
+    """Finds all media (video and audio) files in a directory."""
+    return [
+        item
+        for item in dir_path.iterdir()
+        if item.suffix.lower() in MEDIA_EXTS and item.is_file()
+    ]